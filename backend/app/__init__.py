@@ -2,12 +2,31 @@ import os
 import re
 import hashlib
 import secrets
-from flask import Flask, request, jsonify, make_response, send_file
+from functools import partial
+from flask import Flask, Response, g, request, jsonify, make_response, send_file
 import psycopg
 from app.oracle_genai import create_session, get_reply, generate_podcast as generate_podcast_ai, _load_config
+from app.auth import require_admin
+from app.config import (
+    OCI_CONNECT_TIMEOUT_S,
+    OCI_HEDGE_AFTER_S,
+    OCI_SPEECH_READ_TIMEOUT_S,
+    PROFILE_MAX_SECONDS,
+    TTS_CACHE_DIR,
+    TTS_CACHE_MAX_BYTES,
+)
+from app.profiling import begin_request, end_request, profile_process
+from app.resilience import (
+    CircuitBreaker,
+    UpstreamUnavailable,
+    call_upstream,
+    clear_request_deadline,
+    guard_stream,
+    start_request_deadline,
+)
+from app.export import EXPORT_FORMATS, EXPORT_KINDS, EXPORT_MIMETYPES, iter_export, parse_export_date
 from oci.exceptions import ServiceError
 import oci
-from io import BytesIO
 
 app = Flask(__name__)
 
@@ -16,6 +35,53 @@ LECCAP_BASE = "https://leccap.engin.umich.edu/leccap/player/r/"
 
 _HENRY_VOICE_ID: str | None = None
 
+SPEECH_BREAKER = CircuitBreaker("ai-speech")
+
+
+@app.before_request
+def _start_deadline():
+    # Clients may send a shorter budget; OCI calls never outlive the request
+    start_request_deadline(request.headers.get("X-Request-Timeout-Ms"))
+
+
+@app.teardown_request
+def _clear_deadline(exc):
+    clear_request_deadline()
+
+
+@app.before_request
+def _start_profile():
+    g.profile = begin_request()
+
+
+def _profile_route():
+    return request.url_rule.rule if request.url_rule else request.path
+
+
+@app.after_request
+def _finish_profile_on_close(response):
+    # Streamed bodies are sent after the request context ends, so finish
+    # the capture only once the response is closed
+    profile = g.pop("profile", None)
+    if profile is not None:
+        response.call_on_close(partial(
+            end_request, profile, request.method, _profile_route(), response.status_code
+        ))
+    return response
+
+
+@app.teardown_request
+def _finish_profile(exc):
+    # Still set only if the view raised and after_request never ran
+    profile = g.pop("profile", None)
+    if profile is not None:
+        end_request(profile, request.method, _profile_route(), 500)
+
+
+@app.errorhandler(UpstreamUnavailable)
+def _upstream_unavailable(e):
+    return jsonify({"error": str(e)}), 503
+
 # Regex shared by linkify and timestamp extraction
 TIMESTAMP_RE = re.compile(r"<([A-Za-z0-9]+),\s*([0-9]+-[0-9]+-[0-9]+),\s*([0-9]+:[0-9]+)>")
 
@@ -35,13 +101,46 @@ def linkify_timestamps(text: str) -> str:
         return f"[{timestamp}]({LECCAP_BASE}{code}?start={seconds})"
     return TIMESTAMP_RE.sub(_replace, text)
 
-def get_db():
-    return psycopg.connect(DATABASE_URL)
+def get_db(autocommit: bool = False):
+    return psycopg.connect(DATABASE_URL, autocommit=autocommit)
 
 def sha256_hex(s):
     return hashlib.sha256(s.encode()).hexdigest()
 
-def get_or_create_session(resp):
+# `classes` is static seed data, so name -> class_id is cached per process
+_CLASS_IDS: dict[str, int] = {}
+
+def get_class_id(course: str) -> int | None:
+    """Return the class_id for *course*, or None if it does not exist."""
+    if course not in _CLASS_IDS:
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT name, class_id FROM classes")
+                _CLASS_IDS.update(cur.fetchall())
+    return _CLASS_IDS.get(course)
+
+# Find-or-create the session for a cookie hash inside a single statement.
+# `session` is empty only if a concurrent request inserted the same hash
+# first; running the statement again then finds that row.
+SESSION_CTE = """
+    existing AS (
+        SELECT session_id FROM sessions WHERE session_hash = %(session_hash)s
+    ),
+    created AS (
+        INSERT INTO sessions (session_hash)
+        SELECT %(session_hash)s WHERE NOT EXISTS (SELECT 1 FROM existing)
+        ON CONFLICT (session_hash) DO NOTHING
+        RETURNING session_id
+    ),
+    session AS (
+        SELECT session_id FROM existing
+        UNION ALL
+        SELECT session_id FROM created
+    )
+"""
+
+def session_hash_for(resp):
+    """Return the hash of the caller's sid cookie, issuing a new cookie if needed."""
     token = request.cookies.get("sid")
 
     if not token:
@@ -55,26 +154,20 @@ def get_or_create_session(resp):
             max_age=60*60*24*30
         )
 
-    session_hash = sha256_hex(token)
+    return sha256_hex(token)
 
-    with get_db() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT session_id FROM sessions WHERE session_hash = %s",
-                (session_hash,)
-            )
-            row = cur.fetchone()
+def get_or_create_session(resp):
+    params = {"session_hash": session_hash_for(resp)}
 
-            if row:
-                return row[0]
+    with get_db(autocommit=True) as conn:
+        with conn.cursor() as cur:
+            for _ in range(2):
+                cur.execute(f"WITH {SESSION_CTE} SELECT session_id FROM session", params)
+                row = cur.fetchone()
+                if row:
+                    return row[0]
 
-            cur.execute(
-                "INSERT INTO sessions (session_hash) VALUES (%s) RETURNING session_id",
-                (session_hash,)
-            )
-            session_id = cur.fetchone()[0]
-            conn.commit()
-            return session_id
+    raise RuntimeError("Could not create session")
 
 
 @app.route("/api/get_classes", methods=["GET"])
@@ -101,15 +194,12 @@ def chat_history():
     resp = make_response()
     session_id = get_or_create_session(resp)
 
+    class_id = get_class_id(course)
+    if class_id is None:
+        return jsonify({"results": []})
+
     with get_db() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT class_id FROM classes WHERE name = %s", (course,))
-            row = cur.fetchone()
-            if not row:
-                return jsonify({"results": []})
-
-            class_id = row[0]
-
             cur.execute(
                 "SELECT chat_id FROM chats WHERE session_id = %s AND class_id = %s",
                 (session_id, class_id)
@@ -125,7 +215,7 @@ def chat_history():
                 SELECT created_at, sender, text
                 FROM messages
                 WHERE chat_id = %s
-                ORDER BY created_at ASC
+                ORDER BY created_at ASC, message_id ASC
                 """,
                 (chat_id,)
             )
@@ -150,75 +240,107 @@ def send_message():
     course = data["course"]
     prompt = data["prompt"].strip()
 
+    class_id = get_class_id(course)
+    if class_id is None:
+        return jsonify({"error": "Unknown course"}), 400
+
     resp = make_response()
-    session_id = get_or_create_session(resp)
+    session_params = {"session_hash": session_hash_for(resp), "class_id": class_id}
 
-    with get_db() as conn:
+    # Autocommit: each statement below is atomic on its own, so one
+    # statement is one round trip with no BEGIN/COMMIT around it.
+    with get_db(autocommit=True) as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT class_id FROM classes WHERE name = %s", (course,))
-            row = cur.fetchone()
-            if not row:
-                return jsonify({"error": "Unknown course"}), 400
-            class_id = row[0]
-
-            # Get or create our DB chat, fetching any existing OCI session ID
-            cur.execute(
-                """
-                INSERT INTO chats (session_id, class_id)
-                VALUES (%s, %s)
-                ON CONFLICT (session_id, class_id)
-                DO UPDATE SET session_id = EXCLUDED.session_id
-                RETURNING chat_id, oracle_session_id
-                """,
-                (session_id, class_id)
-            )
-            chat_id, oracle_session_id = cur.fetchone()
-
-            # Create a new OCI agent session if this is the first message
-            if oracle_session_id is None:
-                oracle_session_id = create_session(f"{course} - session {chat_id}")
+            # Find-or-create the session and our DB chat in one statement,
+            # fetching any existing OCI session ID
+            for _ in range(2):
                 cur.execute(
-                    "UPDATE chats SET oracle_session_id = %s WHERE chat_id = %s",
-                    (oracle_session_id, chat_id)
+                    f"""
+                    WITH {SESSION_CTE}
+                    INSERT INTO chats (session_id, class_id)
+                    SELECT session_id, %(class_id)s FROM session
+                    ON CONFLICT (session_id, class_id)
+                    DO UPDATE SET session_id = EXCLUDED.session_id
+                    RETURNING chat_id, oracle_session_id
+                    """,
+                    session_params
                 )
+                row = cur.fetchone()
+                if row:
+                    break
+            else:
+                raise RuntimeError("Could not create session")
+            chat_id, oracle_session_id = row
 
+            new_oracle_session_id = None
             try:
+                # Create a new OCI agent session if this is the first message;
+                # it is saved together with the messages below.  If the agent
+                # is unavailable the prompt is still stored with an apology.
+                if oracle_session_id is None:
+                    oracle_session_id = new_oracle_session_id = create_session(f"{course} - session {chat_id}")
+
                 agent_reply = get_reply(prompt + " Additionally, when referencing a timestamp, always do so in the format <id, date, time>.", oracle_session_id, course)
                 timestamps = extract_timestamps(agent_reply)
                 agent_reply = linkify_timestamps(agent_reply)
             except ServiceError as e:
                 agent_reply = f"Sorry, the AI agent could not process that request. ({e.message})"
                 timestamps = []
+            except UpstreamUnavailable:
+                agent_reply = "Sorry, the AI agent is not responding right now. Please try again in a minute."
+                timestamps = []
 
+            # Store the OCI session, both messages and every referenced
+            # recording timestamp (for analytics) in one statement
             cur.execute(
-                "INSERT INTO messages (chat_id, sender, text) VALUES (%s, 'user', %s)",
-                (chat_id, prompt)
-            )
-            cur.execute(
-                "INSERT INTO messages (chat_id, sender, text) VALUES (%s, 'agent', %s) RETURNING message_id",
-                (chat_id, agent_reply)
-            )
-            agent_message_id = cur.fetchone()[0]
-
-            # Log every referenced recording timestamp for analytics
-            for _rec_id, rec_date, rec_time in timestamps:
-                cur.execute(
-                    """
-                    INSERT INTO recording_hits (message_id, class_id, rec_date, rec_time)
-                    VALUES (%s, %s, %s, %s)
-                    """,
-                    (agent_message_id, class_id, rec_date, rec_time)
+                """
+                WITH chat AS (
+                    UPDATE chats SET oracle_session_id = %(oracle_session_id)s
+                    WHERE  chat_id = %(chat_id)s
+                      AND  oracle_session_id IS NULL
+                      AND  %(oracle_session_id)s::text IS NOT NULL
+                ),
+                msgs AS (
+                    INSERT INTO messages (chat_id, sender, text)
+                    VALUES (%(chat_id)s, 'user', %(prompt)s),
+                           (%(chat_id)s, 'agent', %(reply)s)
+                    RETURNING message_id, sender
                 )
-
-        conn.commit()
+                INSERT INTO recording_hits (message_id, class_id, recording_id, rec_date, rec_time)
+                SELECT m.message_id, %(class_id)s, t.recording_id, t.rec_date::date, t.rec_time
+                FROM   msgs m,
+                       unnest(%(rec_ids)s::text[], %(rec_dates)s::text[], %(rec_times)s::text[])
+                           AS t(recording_id, rec_date, rec_time)
+                WHERE  m.sender = 'agent'
+                """,
+                {
+                    "oracle_session_id": new_oracle_session_id,
+                    "chat_id": chat_id,
+                    "class_id": class_id,
+                    "prompt": prompt,
+                    "reply": agent_reply,
+                    "rec_ids": [t[0] for t in timestamps],
+                    "rec_dates": [t[1] for t in timestamps],
+                    "rec_times": [t[2] for t in timestamps],
+                }
+            )
 
     resp.set_data(jsonify({"reply": agent_reply}).get_data())
     resp.mimetype = "application/json"
     return resp
 
 
-def oci_tts_mp3(text: str) -> bytes:
-    """Generate MP3 audio from text using OCI TTS with Henry voice."""
+# Bytes per chunk forwarded from the Speech response to the client
+TTS_CHUNK_BYTES = 64 * 1024
+
+
+def oci_tts_stream(text: str):
+    """Start OCI TTS synthesis with Henry voice and return an iterator over
+    the MP3 chunks as they arrive.
+
+    Synthesis is requested up front, so upstream errors are raised here
+    rather than midway through a response.
+    """
     global _HENRY_VOICE_ID
 
     config = _load_config()
@@ -226,7 +348,11 @@ def oci_tts_mp3(text: str) -> bytes:
     if not scope_ocid:
         raise ValueError("Missing tenancy in ~/.oci/config [DEFAULT].")
 
-    client = oci.ai_speech.AIServiceSpeechClient(config)
+    # The read timeout bounds each wait on Speech: the synthesis call itself
+    # (including an orphaned or losing hedge) and every read of the body
+    client = oci.ai_speech.AIServiceSpeechClient(
+        config, timeout=(OCI_CONNECT_TIMEOUT_S, OCI_SPEECH_READ_TIMEOUT_S)
+    )
 
     language_code = "en-US"
     model_name = "TTS_2_NATURAL"
@@ -234,7 +360,10 @@ def oci_tts_mp3(text: str) -> bytes:
 
     # Resolve Henry voice ID once and cache it
     if _HENRY_VOICE_ID is None:
-        voices_resp = client.list_voices(
+        voices_resp = call_upstream(
+            SPEECH_BREAKER,
+            client.list_voices,
+            hedge_after=OCI_HEDGE_AFTER_S,
             compartment_id=scope_ocid,
             language_code=language_code,
             model_name=model_name,
@@ -251,9 +380,11 @@ def oci_tts_mp3(text: str) -> bytes:
         language_code=language_code,
     )
 
+    # Streamed synthesis: OCI sends MP3 chunks as they are rendered, so the
+    # client hears audio before the whole clip is done
     synth_details = oci.ai_speech.models.SynthesizeSpeechDetails(
         text=text,
-        is_stream_enabled=False,
+        is_stream_enabled=True,
         compartment_id=scope_ocid,
         configuration=oci.ai_speech.models.TtsOracleConfiguration(
             model_family="ORACLE",
@@ -269,25 +400,110 @@ def oci_tts_mp3(text: str) -> bytes:
         ),
     )
 
-    resp = client.synthesize_speech(synthesize_speech_details=synth_details)
+    # The result is an open streaming response: a losing hedge's is closed
+    # unread so its connection goes back to the pool
+    resp = call_upstream(
+        SPEECH_BREAKER,
+        client.synthesize_speech,
+        hedge_after=OCI_HEDGE_AFTER_S,
+        discard=_close_response,
+        synthesize_speech_details=synth_details,
+    )
+    return guard_stream(SPEECH_BREAKER, _iter_stream(resp.data))
+
+
+def _close_response(resp):
+    close = getattr(resp.data, "close", None)
+    if close is not None:
+        close()
+
 
-    stream = resp.data
-    out = bytearray()
+def _iter_stream(stream):
+    """Yield an OCI binary response body chunk by chunk, then release it."""
+    try:
+        if hasattr(stream, "raw") and hasattr(stream.raw, "stream"):
+            for chunk in stream.raw.stream(TTS_CHUNK_BYTES, decode_content=False):
+                if chunk:
+                    yield chunk
+        elif hasattr(stream, "read"):
+            while True:
+                chunk = stream.read(TTS_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+        else:
+            yield bytes(stream)
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+
+def _tee_to_file(chunks, path: str):
+    """Pass *chunks* through while writing them to *path*.
+
+    The file only appears once the stream completes; a failed or abandoned
+    stream leaves nothing behind.
+    """
+    tmp_path = f"{path}.{secrets.token_hex(4)}.part"
+    complete = False
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        os.replace(tmp_path, path)
+        complete = True
+    finally:
+        chunks.close()
+        if not complete:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def _prune_tts_cache(directory: str, max_bytes: int):
+    """Delete the least recently used cached MP3s until *directory* holds
+    at most *max_bytes* of them."""
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".mp3") and entry.is_file():
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
 
-    if hasattr(stream, "raw") and hasattr(stream.raw, "stream"):
-        for chunk in stream.raw.stream(1024 * 1024, decode_content=False):
-            if chunk:
-                out.extend(chunk)
-    elif hasattr(stream, "read"):
-        while True:
-            chunk = stream.read(1024 * 1024)
-            if not chunk:
-                break
-            out.extend(chunk)
-    else:
-        out.extend(bytes(stream))
 
-    return bytes(out)
+def tts_response(text: str):
+    """Return an audio/mpeg response that streams synthesized speech for *text*.
+
+    Chunks are forwarded as OCI produces them, so memory stays flat whatever
+    the audio length.  With TTS_CACHE_DIR set, repeated text is served from
+    disk and new audio is teed into the cache while it streams; the cache is
+    kept under TTS_CACHE_MAX_BYTES by evicting the least recently served.
+    """
+    cache_path = None
+    if TTS_CACHE_DIR:
+        os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+        cache_path = os.path.join(TTS_CACHE_DIR, f"henry-{sha256_hex(text)}.mp3")
+        if os.path.exists(cache_path):
+            # Mark as recently used for eviction
+            os.utime(cache_path)
+            return send_file(cache_path, mimetype="audio/mpeg", as_attachment=False)
+        _prune_tts_cache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
+
+    chunks = oci_tts_stream(text)
+    if cache_path:
+        chunks = _tee_to_file(chunks, cache_path)
+    return Response(chunks, mimetype="audio/mpeg")
 
 
 @app.route("/api/tts", methods=["POST"])
@@ -301,12 +517,9 @@ def tts():
         return jsonify({"error": "text cannot be empty"}), 400
 
     try:
-        mp3_bytes = oci_tts_mp3(text)
-        return send_file(
-            BytesIO(mp3_bytes),
-            mimetype="audio/mpeg",
-            as_attachment=False
-        )
+        return tts_response(text)
+    except UpstreamUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -328,14 +541,12 @@ def generate_podcast():
     session_id = get_or_create_session(resp)
 
     try:
+        class_id = get_class_id(course)
+        if class_id is None:
+            return jsonify({"error": "Unknown course"}), 400
+
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT class_id FROM classes WHERE name = %s", (course,))
-                row = cur.fetchone()
-                if not row:
-                    return jsonify({"error": "Unknown course"}), 400
-                class_id = row[0]
-
                 # Get or create our DB chat, fetching any existing OCI session ID
                 cur.execute(
                     """
@@ -407,15 +618,13 @@ def generate_podcast():
             podcast_text = generate_podcast_ai(podcast_prompt, str(oracle_session_id), recording_id)
         except ServiceError as e:
             podcast_text = f"Sorry, the podcast generator could not process that request. {e.message}"
+        except UpstreamUnavailable:
+            podcast_text = "Sorry, the podcast generator is not responding right now. Please try again in a minute."
 
-        # Convert the podcast text to speech
-        mp3_bytes = oci_tts_mp3(podcast_text)
-
-        return send_file(
-            BytesIO(mp3_bytes),
-            mimetype="audio/mpeg",
-            as_attachment=False
-        )
+        # Convert the podcast text to speech, streaming audio as it is synthesized
+        return tts_response(podcast_text)
+    except UpstreamUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         print(f"Podcast generation error: {e}")
         return jsonify({"error": str(e)}), 500
@@ -434,21 +643,24 @@ def professor_heatmap():
     if not course:
         return jsonify({"error": "Missing ?course="}), 400
 
+    class_id = get_class_id(course)
+    if class_id is None:
+        return jsonify({"lectures": []})
+
     with get_db() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT class_id FROM classes WHERE name = %s", (course,))
-            row = cur.fetchone()
-            if not row:
-                return jsonify({"lectures": []})
-            class_id = row[0]
-
-            # Pull every hit for this class, ordered by lecture date
+            # Pull every hit for this class, ordered by lecture date.  Older
+            # hits have no recording_id, so fall back to the catalog entry
+            # for that class and date.
             cur.execute(
                 """
-                SELECT rec_date, rec_time
-                FROM   recording_hits
-                WHERE  class_id = %s
-                ORDER  BY rec_date, rec_time
+                SELECT h.rec_date, h.rec_time,
+                       COALESCE(h.recording_id, l.recording_id)
+                FROM   recording_hits h
+                LEFT   JOIN lectures l
+                       ON l.class_id = h.class_id AND l.lecture_date = h.rec_date
+                WHERE  h.class_id = %s
+                ORDER  BY h.rec_date, h.rec_time
                 """,
                 (class_id,),
             )
@@ -457,7 +669,10 @@ def professor_heatmap():
     # Group hits by lecture date and bucket into 5-min chunks
     from collections import defaultdict
     date_hits = defaultdict(list)  # date -> [total_seconds, …]
-    for rec_date, rec_time in rows:
+    date_recording = {}  # date -> recording_id
+    for rec_date, rec_time, recording_id in rows:
+        if recording_id:
+            date_recording.setdefault(rec_date, recording_id)
         # rec_time is stored as "MM:SS"
         parts = rec_time.split(":")
         try:
@@ -479,8 +694,144 @@ def professor_heatmap():
         lectures.append({
             "id": idx,
             "date": str(rec_date),
+            "recording_id": date_recording.get(rec_date),
             "duration_minutes": n_chunks * 5,
             "counts": counts,
         })
 
     return jsonify({"lectures": lectures})
+
+
+@app.route("/api/lectures", methods=["GET"])
+def lecture_catalog():
+    """Return the lecture catalog for a course, ordered by lecture date."""
+    course = request.args.get("course")
+    if not course:
+        return jsonify({"error": "Missing ?course="}), 400
+
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT l.recording_id, l.lecture_date
+                FROM   lectures l
+                JOIN   classes c ON c.class_id = l.class_id
+                WHERE  c.name = %s
+                ORDER  BY l.lecture_date
+                """,
+                (course,),
+            )
+            rows = cur.fetchall()
+
+    return jsonify({"lectures": [
+        {"recording_id": r[0], "lecture_date": str(r[1])}
+        for r in rows
+    ]})
+
+
+@app.route("/api/professor/recordings", methods=["GET"])
+def professor_recordings():
+    """Return every catalogued recording for a course with its hit count."""
+    course = request.args.get("course")
+    if not course:
+        return jsonify({"error": "Missing ?course="}), 400
+
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT l.recording_id, l.lecture_date,
+                       (SELECT count(*) FROM recording_hits h
+                        WHERE h.recording_id = l.recording_id)
+                FROM   lectures l
+                JOIN   classes c ON c.class_id = l.class_id
+                WHERE  c.name = %s
+                ORDER  BY l.lecture_date
+                """,
+                (course,),
+            )
+            rows = cur.fetchall()
+
+    return jsonify({"recordings": [
+        {"recording_id": r[0], "lecture_date": str(r[1]), "hits": r[2]}
+        for r in rows
+    ]})
+
+
+@app.route("/api/professor/recordings/<recording_id>/top_timestamps", methods=["GET"])
+def professor_top_timestamps(recording_id):
+    """Return the most-asked-about timestamps within a single recording."""
+    limit = request.args.get("limit", 10, type=int)
+    limit = max(1, min(limit, 100))
+
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT rec_time, count(*) AS hits
+                FROM   recording_hits
+                WHERE  recording_id = %s
+                GROUP  BY rec_time
+                ORDER  BY hits DESC, rec_time
+                LIMIT  %s
+                """,
+                (recording_id, limit),
+            )
+            rows = cur.fetchall()
+
+    return jsonify({
+        "recording_id": recording_id,
+        "timestamps": [{"time": r[0], "hits": r[1]} for r in rows],
+    })
+
+
+@app.route("/api/professor/export", methods=["GET"])
+@require_admin
+def professor_export():
+    """Stream a course's messages or recording hits as NDJSON or CSV.
+
+    Query params: ``course`` (required), ``kind`` (messages|hits),
+    ``format`` (ndjson|csv), and optional inclusive ``since``/``until``
+    dates (YYYY-MM-DD).  Rows are read through a server-side cursor and sent
+    as a chunked response, so large exports never sit in memory.  Exports
+    contain raw student chats, so this requires the admin token.
+    """
+    course = request.args.get("course")
+    if not course:
+        return jsonify({"error": "Missing ?course="}), 400
+
+    kind = request.args.get("kind", "messages")
+    fmt = request.args.get("format", "ndjson")
+    if kind not in EXPORT_KINDS:
+        return jsonify({"error": f"kind must be one of {', '.join(EXPORT_KINDS)}"}), 400
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+
+    try:
+        since = parse_export_date(request.args.get("since"))
+        until = parse_export_date(request.args.get("until"))
+    except ValueError:
+        return jsonify({"error": "since/until must be YYYY-MM-DD"}), 400
+
+    filename = f"{course}-{kind}.{fmt}"
+    return Response(
+        iter_export(DATABASE_URL, course, kind, fmt, since, until),
+        mimetype=EXPORT_MIMETYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.route("/api/admin/profile", methods=["POST"])
+@require_admin
+def admin_profile():
+    """Sample every worker thread for ?seconds=N (default 10) and return the
+    stacks in collapsed format, ready for flamegraph.pl or speedscope.
+
+    Samples are wall-clock stacks with idle waits (locks, queues, selectors,
+    socket reads, idle pool workers) and this request's own thread left out.
+    Threads blocked inside C code called from elsewhere (time.sleep, a
+    psycopg query) cannot be told apart from running ones and still show up.
+    """
+    seconds = request.args.get("seconds", 10, type=float)
+    seconds = max(0.1, min(seconds, PROFILE_MAX_SECONDS))
+    return Response(profile_process(seconds), mimetype="text/plain")
@@ -0,0 +1,28 @@
+import hmac
+from functools import wraps
+
+from flask import jsonify, request
+
+from app.config import ADMIN_TOKEN
+
+
+def is_admin_token(token: str | None) -> bool:
+    """Whether *token* matches the configured ADMIN_TOKEN (never, if unset)."""
+    if not ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def require_admin(view):
+    """Allow *view* only with a matching X-Admin-Token header.
+
+    Admin routes answer 404 when ADMIN_TOKEN is not configured.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"error": "Not found"}), 404
+        if not is_admin_token(request.headers.get("X-Admin-Token")):
+            return jsonify({"error": "Forbidden"}), 403
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,46 @@
+import os
+
+
+def _env_float(name: str, default: float | None) -> float | None:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+# ---- OCI upstream calls ----
+# Deadline applied to every OCI call; a request may shorten it with the
+# X-Request-Timeout-Ms header but never extend it.
+OCI_DEFAULT_DEADLINE_S = _env_float("OCI_DEFAULT_DEADLINE_S", 120.0)
+OCI_CONNECT_TIMEOUT_S = _env_float("OCI_CONNECT_TIMEOUT_S", 10.0)
+# Longest single wait on a Speech response (the synthesis call, or one read of
+# the streamed audio).  The audio body as a whole gets OCI_DEFAULT_DEADLINE_S
+# of upstream wait time, counted from when synthesis starts streaming.
+OCI_SPEECH_READ_TIMEOUT_S = _env_float("OCI_SPEECH_READ_TIMEOUT_S", 30.0)
+
+# Consecutive upstream failures that open a breaker, and how long it stays open
+OCI_BREAKER_FAILURES = int(os.environ.get("OCI_BREAKER_FAILURES", "5"))
+OCI_BREAKER_RESET_S = _env_float("OCI_BREAKER_RESET_S", 30.0)
+
+# Send a second copy of an idempotent call (list_voices, TTS) if the first has
+# not answered after this many seconds.  Unset disables hedging.
+OCI_HEDGE_AFTER_S = _env_float("OCI_HEDGE_AFTER_S", None)
+OCI_HEDGE_MAX_ATTEMPTS = 2
+
+OCI_MAX_WORKERS = int(os.environ.get("OCI_MAX_WORKERS", "16"))
+
+# ---- Admin / profiling ----
+# Admin endpoints require this in the X-Admin-Token header; unset disables them.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+PROFILE_INTERVAL_S = _env_float("PROFILE_INTERVAL_S", 0.005)
+PROFILE_MAX_SECONDS = 60
+# Requests slower than this get their sampled profile written to PROFILE_DIR.
+# Unset disables slow-request capture.
+SLOW_REQUEST_MS = _env_float("SLOW_REQUEST_MS", None)
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "/tmp/motus-profiles")
+
+# ---- Text-to-speech ----
+# When set, synthesized MP3s are teed into this directory while streaming and
+# served from it for repeated text.  Unset disables the cache.
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR")
+# Least recently served files are evicted once the cache grows past this
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
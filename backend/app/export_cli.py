@@ -0,0 +1,44 @@
+"""Command-line entry point for :mod:`app.export`.
+
+Kept separate from ``app.export`` because the package imports that module,
+and running it with ``-m`` would load it twice:
+
+    python -m app.export_cli econ409 --kind hits --format csv --since 2025-01-01
+"""
+import argparse
+import os
+import sys
+from datetime import date
+
+from app.auth import is_admin_token
+from app.export import EXPORT_FORMATS, EXPORT_KINDS, iter_export
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.export_cli",
+        description="Stream a course's messages or recording hits to stdout.",
+    )
+    parser.add_argument("course")
+    parser.add_argument("--kind", choices=EXPORT_KINDS, default="messages")
+    parser.add_argument("--format", dest="fmt", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--since", type=date.fromisoformat, help="YYYY-MM-DD, inclusive")
+    parser.add_argument("--until", type=date.fromisoformat, help="YYYY-MM-DD, inclusive")
+    parser.add_argument("--admin-token", default=os.environ.get("EXPORT_ADMIN_TOKEN"),
+                        help="must match ADMIN_TOKEN (default: $EXPORT_ADMIN_TOKEN)")
+    args = parser.parse_args(argv)
+
+    if not is_admin_token(args.admin_token):
+        parser.error("a valid --admin-token is required (and ADMIN_TOKEN must be set)")
+
+    conninfo = os.environ.get("DATABASE_URL")
+    if not conninfo:
+        parser.error("DATABASE_URL is not set")
+
+    for chunk in iter_export(conninfo, args.course, args.kind, args.fmt, args.since, args.until):
+        sys.stdout.write(chunk)
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Load the static lecture catalog into the ``lectures`` table.
+
+The catalog is the same ``lectures.json`` the frontend bundles
+(``{course: [{lecture_date: "M-D-YYYY", recording_id}, ...]}``).  Loading is
+an idempotent upsert followed by a backfill of ``recording_hits.recording_id``
+for older hits, so it is safe to run on every container start:
+
+    python -m app.lectures /app/lectures.json
+"""
+import json
+import os
+import sys
+from datetime import datetime
+
+import psycopg
+
+DEFAULT_CATALOG_PATH = os.environ.get("LECTURES_JSON", "/app/lectures.json")
+
+
+def load_lecture_catalog(conn, path: str) -> int:
+    """Upsert every lecture in *path* for courses present in ``classes``.
+
+    Returns the number of lectures written; courses missing from ``classes``
+    are reported and skipped.
+    """
+    with open(path) as f:
+        catalog = json.load(f)
+
+    rows = [
+        (
+            lecture["recording_id"],
+            datetime.strptime(lecture["lecture_date"], "%m-%d-%Y").date(),
+            course,
+        )
+        for course, lectures in catalog.items()
+        for lecture in lectures
+    ]
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT name FROM classes WHERE name = ANY(%s)", (list(catalog),))
+        known = {r[0] for r in cur.fetchall()}
+        for course in sorted(set(catalog) - known):
+            print(f"Skipping lectures for unknown course {course!r}")
+
+        cur.executemany(
+            """
+            INSERT INTO lectures (recording_id, class_id, lecture_date)
+            SELECT %s, class_id, %s FROM classes WHERE name = %s
+            ON CONFLICT (recording_id)
+            DO UPDATE SET class_id = EXCLUDED.class_id,
+                          lecture_date = EXCLUDED.lecture_date
+            """,
+            [row for row in rows if row[2] in known],
+        )
+        written = cur.rowcount
+    conn.commit()
+    return written
+
+
+def backfill_recording_hits(conn) -> int:
+    """Fill in recording_id on hits stored before it was recorded.
+
+    Matches each hit to the catalogued lecture of the same class and date.
+    Idempotent; returns the number of hits updated.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE recording_hits h
+            SET    recording_id = l.recording_id
+            FROM   lectures l
+            WHERE  h.recording_id IS NULL
+              AND  l.class_id = h.class_id
+              AND  l.lecture_date = h.rec_date
+            """
+        )
+        updated = cur.rowcount
+    conn.commit()
+    return updated
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else DEFAULT_CATALOG_PATH
+
+    if not os.path.exists(path):
+        print(f"No lecture catalog at {path}; skipping.")
+        return
+
+    with psycopg.connect(os.environ["DATABASE_URL"]) as conn:
+        count = load_lecture_catalog(conn, path)
+        backfilled = backfill_recording_hits(conn)
+    print(f"Loaded {count} lectures from {path}; backfilled recording_id on {backfilled} hits")
+
+
+if __name__ == "__main__":
+    main()
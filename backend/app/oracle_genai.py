@@ -6,6 +6,9 @@ import uuid
 from oci import generative_ai_agent_runtime
 from oci.generative_ai_agent_runtime.models import CreateSessionDetails, ChatDetails
 
+from app.config import OCI_CONNECT_TIMEOUT_S, OCI_DEFAULT_DEADLINE_S
+from app.resilience import CircuitBreaker, call_upstream
+
 SERVICE_EP = "https://agent-runtime.generativeai.us-ashburn-1.oci.oraclecloud.com"
 AGENT_ENDPOINT_ID = "ocid1.genaiagentendpoint.oc1.iad.amaaaaaampxat2aaxjz33hwfopkwsudqpudspkm5jubn6vtpi6mcbo6jnpya"
 
@@ -80,6 +83,9 @@ def _load_config():
 config = None
 client = None
 
+# One breaker for the agent endpoint: sessions and chats fail together
+AGENT_BREAKER = CircuitBreaker("genai-agent")
+
 
 def _get_client():
     """Get or create the OCI client lazily."""
@@ -92,6 +98,10 @@ def _get_client():
             client = generative_ai_agent_runtime.GenerativeAiAgentRuntimeClient(
                 config=cfg,
                 service_endpoint=SERVICE_EP,
+                # Shared across requests, so the read timeout cannot follow a
+                # single request's deadline; it caps how long an abandoned
+                # call can hold an OCI worker.
+                timeout=(OCI_CONNECT_TIMEOUT_S, OCI_DEFAULT_DEADLINE_S),
             )
             print("[DEBUG] OCI client initialized successfully")
         except Exception as e:
@@ -103,7 +113,9 @@ def _get_client():
 def create_session(display_name: str) -> str:
     """Create a new OCI agent session and return its ID."""
     client = _get_client()
-    resp = client.create_session(
+    resp = call_upstream(
+        AGENT_BREAKER,
+        client.create_session,
         agent_endpoint_id=AGENT_ENDPOINT_ID,
         create_session_details=CreateSessionDetails(
             display_name=display_name,
@@ -120,7 +132,9 @@ def get_reply(prompt: str, oracle_session_id: str, course_id: str = "econ409") -
     ``course`` metadata field matches *course_id* are considered.
     """
     client = _get_client()
-    resp = client.chat(
+    resp = call_upstream(
+        AGENT_BREAKER,
+        client.chat,
         agent_endpoint_id=AGENT_ENDPOINT_ID,
         chat_details=ChatDetails(
             user_message=prompt,
@@ -150,7 +164,10 @@ def generate_podcast(prompt: str, oracle_session_id: str, recording_id: str) ->
     Filters the knowledge-base retrieval so only documents whose
     ``recording_id`` metadata field matches *recording_id* are considered.
     """
-    resp = client.chat(
+    client = _get_client()
+    resp = call_upstream(
+        AGENT_BREAKER,
+        client.chat,
         agent_endpoint_id=AGENT_ENDPOINT_ID,
         chat_details=ChatDetails(
             session_id=create_session(str(uuid.uuid4())),
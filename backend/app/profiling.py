@@ -0,0 +1,241 @@
+"""Low-overhead sampling profiler and slow-request capture.
+
+A single daemon thread wakes every PROFILE_INTERVAL_S while something is
+being profiled and records the Python stack of the threads of interest from
+``sys._current_frames()``.  Stacks are aggregated in the "collapsed" format
+(``outer;inner;leaf count`` per line) that flamegraph.pl, speedscope and
+inferno read directly.
+
+Two things use it:
+
+* :func:`profile_process` samples every thread of this process (i.e. every
+  Flask worker thread) for N seconds, for the admin endpoint.  Threads parked
+  in an idle wait are skipped so the output shows where CPU goes.
+* :func:`begin_request` / :func:`end_request` sample the request's own
+  thread, plus any OCI worker thread running a call for it (see
+  :func:`profiled`), and, when the request took longer than SLOW_REQUEST_MS,
+  write its profile and timing breakdown to PROFILE_DIR.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from app.config import PROFILE_DIR, PROFILE_INTERVAL_S, SLOW_REQUEST_MS
+
+# Named wall-clock timings (e.g. "oci:genai-agent") for the current request
+_timings: ContextVar[dict | None] = ContextVar("request_timings", default=None)
+# Slow-request capture in progress on this thread, if any
+_current: ContextVar["_RequestProfile | None"] = ContextVar("request_profile", default=None)
+
+
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+def format_collapsed(counts: Counter) -> str:
+    return "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+
+
+# (file, function) of innermost Python frames that mean a thread is parked
+# waiting for work or I/O rather than running
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("socket.py", "accept"),
+    ("socket.py", "readinto"),
+    ("ssl.py", "read"),
+    ("ssl.py", "recv"),
+    ("ssl.py", "recv_into"),
+    # concurrent.futures worker blocked on its (C) work queue
+    ("thread.py", "_worker"),
+}
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES
+
+
+class _Session:
+    __slots__ = ("thread_ids", "exclude", "skip_idle", "counts")
+
+    def __init__(self, thread_ids, exclude, skip_idle):
+        self.thread_ids = thread_ids  # set of thread ids, or None for all threads
+        self.exclude = exclude
+        self.skip_idle = skip_idle
+        self.counts = Counter()
+
+
+class Sampler:
+    """Samples stacks for registered sessions; idle while none are registered."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._sessions = {}  # key -> _Session
+        self._active = threading.Event()
+        self._thread = None
+
+    def start_session(self, key, thread_id: int | None = None,
+                      exclude=frozenset(), skip_idle: bool = False):
+        """Start sampling *thread_id* (or every thread but *exclude*) under *key*."""
+        with self._lock:
+            thread_ids = None if thread_id is None else {thread_id}
+            self._sessions[key] = _Session(thread_ids, exclude, skip_idle)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+            self._active.set()
+
+    def add_thread(self, key, thread_id: int):
+        with self._lock:
+            if key in self._sessions:
+                self._sessions[key].thread_ids.add(thread_id)
+
+    def remove_thread(self, key, thread_id: int):
+        with self._lock:
+            if key in self._sessions:
+                self._sessions[key].thread_ids.discard(thread_id)
+
+    def stop_session(self, key) -> Counter:
+        with self._lock:
+            session = self._sessions.pop(key, None)
+            if not self._sessions:
+                self._active.clear()
+        return session.counts if session is not None else Counter()
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            self._active.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for session in self._sessions.values():
+                    thread_ids = session.thread_ids
+                    if thread_ids is None:
+                        thread_ids = frames.keys() - session.exclude - {me}
+                    for tid in thread_ids:
+                        frame = frames.get(tid)
+                        if frame is None or (session.skip_idle and _is_idle(frame)):
+                            continue
+                        session.counts[_collapse(frame)] += 1
+
+
+_sampler = Sampler(PROFILE_INTERVAL_S)
+
+
+def profile_process(seconds: float) -> str:
+    """Sample every other thread in this process for *seconds*, skipping idle
+    waits; return collapsed stacks."""
+    key = object()
+    _sampler.start_session(key, exclude={threading.get_ident()}, skip_idle=True)
+    try:
+        time.sleep(seconds)
+    finally:
+        counts = _sampler.stop_session(key)
+    return format_collapsed(counts)
+
+
+@contextmanager
+def timed(name: str):
+    """Add the wall time of the block to the current request's breakdown."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def profiled(fn):
+    """Wrap *fn* so the thread that runs it is sampled as part of the
+    calling request's slow-request capture (a no-op when none is active)."""
+    profile = _current.get()
+    if profile is None:
+        return fn
+
+    def run(*args, **kwargs):
+        thread_id = threading.get_ident()
+        _sampler.add_thread(profile, thread_id)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _sampler.remove_thread(profile, thread_id)
+    return run
+
+
+class _RequestProfile:
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.timings = {}
+
+
+def begin_request():
+    """Start slow-request capture for the current thread, if enabled."""
+    if SLOW_REQUEST_MS is None:
+        return None
+    profile = _RequestProfile()
+    _timings.set(profile.timings)
+    _current.set(profile)
+    _sampler.start_session(profile, threading.get_ident())
+    return profile
+
+
+def end_request(profile, method: str, route: str, status: int | None):
+    """Finish capture; write the profile if the request exceeded SLOW_REQUEST_MS.
+
+    Call this once the response body has been sent, so streamed responses
+    are measured in full.
+    """
+    if profile is None:
+        return
+    counts = _sampler.stop_session(profile)
+    _timings.set(None)
+    _current.set(None)
+
+    total_ms = (time.perf_counter() - profile.start) * 1000
+    if total_ms < SLOW_REQUEST_MS:
+        return
+
+    timings_ms = {name: round(s * 1000, 1) for name, s in profile.timings.items()}
+    timings_ms["other"] = round(max(total_ms - sum(timings_ms.values()), 0.0), 1)
+
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    base = os.path.join(
+        PROFILE_DIR,
+        f"{profile.started_at:%Y%m%dT%H%M%S%f}-{method}-{slug}-{int(total_ms)}ms",
+    )
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(base + ".folded", "w") as f:
+            f.write(format_collapsed(counts))
+        with open(base + ".json", "w") as f:
+            json.dump({
+                "method": method,
+                "route": route,
+                "status": status,
+                "started_at": profile.started_at.isoformat(),
+                "total_ms": round(total_ms, 1),
+                "timings_ms": timings_ms,
+                "samples": sum(counts.values()),
+                "sample_interval_ms": PROFILE_INTERVAL_S * 1000,
+            }, f, indent=2)
+    except OSError as e:
+        print(f"[profiling] could not write slow-request profile: {e}")
@@ -0,0 +1,296 @@
+"""Deadlines, circuit breaking and hedging for calls to OCI.
+
+Every upstream call goes through :func:`call_upstream`, which runs it on a
+shared worker pool and waits at most for whatever is left of the current
+request's deadline.  Each upstream has its own :class:`CircuitBreaker`; while
+it is open calls fail immediately with :class:`CircuitOpenError` so callers
+can serve a cached or degraded response instead of piling up.
+
+The deadline bounds how long the *caller* waits; Python threads cannot be
+cancelled, so a call that times out (or loses a hedge) keeps running on its
+worker until the SDK's own read timeout ends it (OCI_SPEECH_READ_TIMEOUT_S
+for the per-call Speech client, OCI_DEFAULT_DEADLINE_S for the shared agent
+client).  A *discard* callback gets the result of any such call that still
+succeeds so it can release it (e.g. close a streamed body).  Calls never
+queue for a worker: when all OCI_MAX_WORKERS are busy, new calls fail at
+once with :class:`PoolSaturated`, so orphaned calls cannot eat later
+requests' deadlines.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+
+from oci.exceptions import ServiceError
+
+from app.config import (
+    OCI_BREAKER_FAILURES,
+    OCI_BREAKER_RESET_S,
+    OCI_DEFAULT_DEADLINE_S,
+    OCI_HEDGE_MAX_ATTEMPTS,
+    OCI_MAX_WORKERS,
+)
+from app.profiling import profiled, timed
+
+_executor = ThreadPoolExecutor(max_workers=OCI_MAX_WORKERS, thread_name_prefix="oci")
+# One slot per worker; a call only starts if it can run immediately
+_slots = threading.BoundedSemaphore(OCI_MAX_WORKERS)
+
+# (absolute time.monotonic() deadline, whether the client shortened it) for
+# the current request, if any
+_deadline: ContextVar[tuple[float, bool] | None] = ContextVar("oci_deadline", default=None)
+
+
+class UpstreamUnavailable(Exception):
+    """An upstream call was not attempted or did not finish in time."""
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    pass
+
+
+class PoolSaturated(UpstreamUnavailable):
+    pass
+
+
+def start_request_deadline(timeout_ms: str | None = None):
+    """Start the deadline for the current request.
+
+    *timeout_ms* is the client's budget (e.g. from a header); it can only
+    shorten OCI_DEFAULT_DEADLINE_S.  Running out of a client-shortened
+    budget fails the call but is not held against the upstream's breaker.
+    """
+    budget = OCI_DEFAULT_DEADLINE_S
+    if timeout_ms:
+        try:
+            budget = min(budget, max(int(timeout_ms), 0) / 1000)
+        except ValueError:
+            pass
+    _deadline.set((time.monotonic() + budget, budget < OCI_DEFAULT_DEADLINE_S))
+
+
+def clear_request_deadline():
+    _deadline.set(None)
+
+
+def remaining_time() -> float:
+    """Seconds left before the current deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return OCI_DEFAULT_DEADLINE_S
+    return deadline[0] - time.monotonic()
+
+
+def _client_shortened() -> bool:
+    deadline = _deadline.get()
+    return deadline is not None and deadline[1]
+
+
+def _is_upstream_fault(exc: BaseException) -> bool:
+    """Whether *exc* says the upstream is unhealthy, as opposed to a bad request."""
+    if isinstance(exc, ServiceError):
+        return exc.status == 429 or exc.status >= 500
+    return True
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open trial call."""
+
+    def __init__(self, name: str, failure_threshold: int = OCI_BREAKER_FAILURES,
+                 reset_timeout: float = OCI_BREAKER_RESET_S):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return (self._opened_at is not None
+                    and time.monotonic() - self._opened_at < self.reset_timeout)
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print(f"[breaker] {self.name} opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """End a half-open trial that neither succeeded nor failed upstream."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+def call_upstream(breaker: CircuitBreaker, fn, *args, hedge_after: float | None = None,
+                  discard=None, **kwargs):
+    """Call ``fn(*args, **kwargs)`` under *breaker* and the request deadline.
+
+    With *hedge_after* set (only for idempotent calls), a second attempt is
+    started if the first has not answered after that many seconds or fails
+    with an upstream fault; whichever succeeds first wins.  *discard*, if
+    given, is called with the result of every attempt that succeeds but is
+    not returned (a losing hedge, or a call that outlived the deadline).
+    """
+    breaker.before_call()
+    with timed(f"oci:{breaker.name}"):
+        return _call_upstream(breaker, fn, args, kwargs, hedge_after, discard)
+
+
+def _submit(fn, args, kwargs):
+    """Start ``fn`` on a free worker, or return None if every worker is busy."""
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        return None
+    future = _executor.submit(profiled(fn), *args, **kwargs)
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def _discard_when_done(futures, discard):
+    """Pass the result of each of *futures* that succeeds to *discard*."""
+    def on_done(future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        try:
+            discard(future.result())
+        except Exception as e:
+            print(f"[resilience] could not discard an unused result: {e}")
+
+    for future in futures:
+        future.add_done_callback(on_done)
+
+
+def _call_upstream(breaker, fn, args, kwargs, hedge_after, discard):
+    end = time.monotonic() + remaining_time()
+    client_shortened = _client_shortened()
+    if end <= time.monotonic():
+        breaker.release_trial()
+        raise DeadlineExceeded(f"{breaker.name}: request deadline already passed")
+
+    first = _submit(fn, args, kwargs)
+    if first is None:
+        breaker.release_trial()
+        raise PoolSaturated(f"{breaker.name}: all {OCI_MAX_WORKERS} OCI workers are busy")
+
+    pending = {first}
+    try:
+        return _await_attempts(breaker, fn, args, kwargs, hedge_after, discard,
+                               end, client_shortened, pending)
+    except BaseException:
+        if discard is not None:
+            _discard_when_done(pending, discard)
+        raise
+
+
+def _await_attempts(breaker, fn, args, kwargs, hedge_after, discard,
+                    end, client_shortened, pending):
+    """Wait for the attempts in *pending* (updated in place) until one wins."""
+    attempts = 1
+    last_exc = None
+
+    while True:
+        left = end - time.monotonic()
+        if left <= 0:
+            # Only the server's own budget says anything about upstream health
+            if client_shortened:
+                breaker.release_trial()
+            else:
+                breaker.record_failure()
+            raise DeadlineExceeded(f"{breaker.name} did not answer before the deadline")
+
+        can_hedge = hedge_after is not None and attempts < OCI_HEDGE_MAX_ATTEMPTS
+        done, not_done = wait(
+            pending,
+            timeout=min(left, hedge_after) if can_hedge else left,
+            return_when=FIRST_COMPLETED,
+        )
+        pending.intersection_update(not_done)
+
+        winner = next((f for f in done if f.exception() is None), None)
+        if winner is not None:
+            breaker.record_success()
+            if discard is not None:
+                _discard_when_done((done - {winner}) | pending, discard)
+            return winner.result()
+        for future in done:
+            last_exc = future.exception()
+
+        if last_exc is not None and not _is_upstream_fault(last_exc):
+            breaker.release_trial()
+            raise last_exc
+
+        if can_hedge and (not done or not pending):
+            hedge = _submit(fn, args, kwargs)
+            if hedge is not None:
+                pending.add(hedge)
+            # A saturated pool also ends hedging for this call
+            attempts += 1
+
+        if not pending:
+            breaker.record_failure()
+            raise last_exc
+
+
+def guard_stream(breaker: CircuitBreaker, chunks, budget: float = OCI_DEFAULT_DEADLINE_S):
+    """Iterate an upstream response body under *breaker*.
+
+    The body has its own *budget*, independent of the request deadline: only
+    time spent waiting on the upstream for the next chunk counts against it,
+    not time the consumer takes to accept a chunk, so a slow client never
+    trips the breaker.  A failure or budget overrun mid-stream counts against
+    the breaker.  The budget is checked after each read, so a single stalled
+    read is bounded by the client's read timeout instead.
+    """
+    return _guarded(breaker, chunks, budget)
+
+
+def _guarded(breaker, chunks, budget):
+    it = iter(chunks)
+    waited = 0.0
+    try:
+        while True:
+            started = time.monotonic()
+            try:
+                chunk = next(it)
+            except StopIteration:
+                return
+            waited += time.monotonic() - started
+            if waited > budget:
+                breaker.record_failure()
+                raise DeadlineExceeded(f"{breaker.name} stream ran past its read budget")
+            yield chunk
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        if _is_upstream_fault(e):
+            breaker.record_failure()
+        raise
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
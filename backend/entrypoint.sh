@@ -22,4 +22,7 @@ else
   echo "No init SQL found at ${INIT_SQL}; skipping."
 fi
 
+echo "Loading lecture catalog..."
+python -m app.lectures || true
+
 exec "$@"
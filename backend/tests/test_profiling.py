@@ -0,0 +1,149 @@
+import json
+import sys
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from app import profiling
+from app.profiling import Sampler, format_collapsed
+
+
+@pytest.fixture
+def stop():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def _spin_in_a(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _spin_in_b(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _start(target, stop):
+    thread = threading.Thread(target=target, args=(stop,), daemon=True)
+    thread.start()
+    return thread
+
+
+def _stacks(counts):
+    return "\n".join(counts)
+
+
+def test_format_collapsed_orders_by_count():
+    counts = Counter({"main;work": 2, "main": 5, "main;work;leaf": 1})
+
+    assert format_collapsed(counts) == "main 5\nmain;work 2\nmain;work;leaf 1\n"
+
+
+def test_collapse_runs_outermost_to_leaf():
+    def inner():
+        return profiling._collapse(sys._getframe())
+
+    def outer():
+        return inner()
+
+    stack = outer()
+    frames = stack.split(";")
+    assert frames[-1].startswith("inner (test_profiling.py:")
+    assert frames[-2].startswith("outer (test_profiling.py:")
+
+
+def test_session_samples_only_its_threads(stop):
+    sampler = Sampler(0.001)
+    a = _start(_spin_in_a, stop)
+    _start(_spin_in_b, stop)
+
+    sampler.start_session("req", a.ident)
+    time.sleep(0.1)
+    counts = sampler.stop_session("req")
+
+    assert counts
+    assert all("_spin_in_a" in stack for stack in counts)
+    assert "_spin_in_b" not in _stacks(counts)
+
+
+def test_added_thread_is_sampled_until_removed(stop):
+    sampler = Sampler(0.001)
+    b = _start(_spin_in_b, stop)
+
+    sampler.start_session("req", threading.get_ident())
+    sampler.add_thread("req", b.ident)
+    time.sleep(0.05)
+    sampler.remove_thread("req", b.ident)
+    with_b = sum(n for stack, n in sampler.stop_session("req").items() if "_spin_in_b" in stack)
+
+    assert with_b > 0
+
+
+def test_process_session_skips_idle_and_excluded_threads(stop):
+    sampler = Sampler(0.001)
+    _start(_spin_in_a, stop)
+    waiter = threading.Thread(target=stop.wait, daemon=True)
+    waiter.start()
+
+    sampler.start_session("all", exclude={threading.get_ident()}, skip_idle=True)
+    time.sleep(0.1)
+    stacks = _stacks(sampler.stop_session("all"))
+
+    assert "_spin_in_a" in stacks
+    assert "wait (threading.py" not in stacks
+    assert "test_process_session_skips_idle_and_excluded_threads" not in stacks
+
+
+@pytest.fixture
+def slow_capture(monkeypatch, tmp_path):
+    def configure(threshold_ms):
+        monkeypatch.setattr(profiling, "SLOW_REQUEST_MS", threshold_ms)
+        monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+        return tmp_path
+    return configure
+
+
+def test_end_request_writes_profile_above_threshold(slow_capture, stop):
+    profile_dir = slow_capture(0)
+
+    profile = profiling.begin_request()
+    worker = threading.Thread(target=profiling.profiled(_spin_in_b), args=(stop,))
+    worker.start()
+    with profiling.timed("oci:test"):
+        time.sleep(0.05)
+    stop.set()
+    worker.join()
+    profiling.end_request(profile, "GET", "/api/chat_history", 200)
+
+    folded = list(profile_dir.glob("*.folded"))
+    meta = list(profile_dir.glob("*.json"))
+    assert len(folded) == 1 and len(meta) == 1
+    assert "GET-api_chat_history" in folded[0].name
+    # The worker registered through profiled() is part of the request's profile
+    assert "_spin_in_b" in folded[0].read_text()
+
+    info = json.loads(meta[0].read_text())
+    assert info["route"] == "/api/chat_history"
+    assert info["status"] == 200
+    assert info["timings_ms"]["oci:test"] >= 50
+    assert "other" in info["timings_ms"]
+
+
+def test_end_request_writes_nothing_below_threshold(slow_capture):
+    profile_dir = slow_capture(60_000)
+
+    profile = profiling.begin_request()
+    profiling.end_request(profile, "GET", "/api/get_classes", 200)
+
+    assert list(profile_dir.iterdir()) == []
+
+
+def test_capture_disabled_without_threshold(slow_capture):
+    slow_capture(None)
+
+    assert profiling.begin_request() is None
+    profiling.end_request(None, "GET", "/api/get_classes", 200)
@@ -0,0 +1,330 @@
+import threading
+import time
+
+import pytest
+from oci.exceptions import ServiceError
+
+from app import resilience
+from app.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    PoolSaturated,
+    call_upstream,
+    clear_request_deadline,
+    guard_stream,
+    start_request_deadline,
+)
+
+
+@pytest.fixture(autouse=True)
+def _no_deadline():
+    clear_request_deadline()
+    yield
+    clear_request_deadline()
+
+
+@pytest.fixture
+def release():
+    """Event that unblocks fake calls left running at the end of a test."""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def _boom():
+    raise ServiceError(503, "ServiceUnavailable", {}, "down")
+
+
+def _fail_n(breaker, n):
+    for _ in range(n):
+        with pytest.raises(ServiceError):
+            call_upstream(breaker, _boom)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+    _fail_n(breaker, 3)
+
+    assert breaker.is_open
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        call_upstream(breaker, lambda: calls.append(1))
+    assert calls == []
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    _fail_n(breaker, 1)
+    assert call_upstream(breaker, lambda: "ok") == "ok"
+    _fail_n(breaker, 1)
+
+    assert not breaker.is_open
+
+
+def test_client_errors_do_not_count():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+
+    def bad_request():
+        raise ServiceError(400, "InvalidParameter", {}, "bad")
+
+    with pytest.raises(ServiceError):
+        call_upstream(breaker, bad_request)
+    assert not breaker.is_open
+
+
+def test_half_open_allows_one_trial_then_closes(release):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+    _fail_n(breaker, 1)
+    time.sleep(0.06)
+
+    def slow_ok():
+        release.wait(5)
+        return "ok"
+
+    result = []
+    trial = threading.Thread(target=lambda: result.append(call_upstream(breaker, slow_ok)))
+    trial.start()
+    time.sleep(0.02)
+
+    # Only one trial call goes through while half-open
+    with pytest.raises(CircuitOpenError):
+        call_upstream(breaker, lambda: "second")
+
+    release.set()
+    trial.join(5)
+    assert result == ["ok"]
+    assert call_upstream(breaker, lambda: "closed") == "closed"
+
+
+def test_failed_trial_reopens_immediately():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=0.05)
+    _fail_n(breaker, 3)
+    time.sleep(0.06)
+
+    _fail_n(breaker, 1)
+
+    with pytest.raises(CircuitOpenError):
+        call_upstream(breaker, lambda: "ok")
+
+
+def test_deadline_exceeded_counts_as_failure(monkeypatch, release):
+    monkeypatch.setattr(resilience, "OCI_DEFAULT_DEADLINE_S", 0.05)
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    start_request_deadline()
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        call_upstream(breaker, release.wait, 5)
+
+    assert time.monotonic() - started < 1
+    assert breaker.is_open
+
+
+def test_client_shortened_deadline_does_not_count(release):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+
+    for _ in range(3):
+        start_request_deadline("1")
+        with pytest.raises(DeadlineExceeded):
+            call_upstream(breaker, release.wait, 5)
+
+    assert not breaker.is_open
+    clear_request_deadline()
+    assert call_upstream(breaker, lambda: "ok") == "ok"
+
+
+def test_client_shortened_deadline_ends_half_open_trial(release):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+    _fail_n(breaker, 1)
+    time.sleep(0.06)
+
+    start_request_deadline("10")
+    with pytest.raises(DeadlineExceeded):
+        call_upstream(breaker, release.wait, 5)
+
+    # The trial slot is free again for the next caller
+    clear_request_deadline()
+    assert call_upstream(breaker, lambda: "ok") == "ok"
+
+
+def test_expired_deadline_does_not_call_upstream():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    start_request_deadline("0")
+    calls = []
+
+    with pytest.raises(DeadlineExceeded):
+        call_upstream(breaker, lambda: calls.append(1))
+    assert calls == []
+    assert not breaker.is_open
+
+
+def test_hedge_fires_when_first_attempt_is_slow(release):
+    breaker = CircuitBreaker("test")
+    attempts = []
+
+    def first_slow():
+        attempts.append(1)
+        if len(attempts) == 1:
+            release.wait(5)
+            return "slow"
+        return "fast"
+
+    assert call_upstream(breaker, first_slow, hedge_after=0.02) == "fast"
+    assert len(attempts) == 2
+
+
+def test_hedge_retries_upstream_fault():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    attempts = []
+
+    def fails_once():
+        attempts.append(1)
+        if len(attempts) == 1:
+            _boom()
+        return "ok"
+
+    assert call_upstream(breaker, fails_once, hedge_after=10) == "ok"
+    assert len(attempts) == 2
+    assert not breaker.is_open
+
+
+def test_no_hedge_without_hedge_after(release):
+    breaker = CircuitBreaker("test")
+    attempts = []
+
+    def slow():
+        attempts.append(1)
+        release.wait(0.1)
+        return "ok"
+
+    assert call_upstream(breaker, slow) == "ok"
+    assert len(attempts) == 1
+
+
+def test_losing_hedge_result_is_discarded(release):
+    breaker = CircuitBreaker("test")
+    attempts = []
+    discarded = []
+
+    def first_slow():
+        attempts.append(1)
+        if len(attempts) == 1:
+            release.wait(5)
+            return "slow"
+        return "fast"
+
+    assert call_upstream(breaker, first_slow, hedge_after=0.02, discard=discarded.append) == "fast"
+    assert discarded == []
+    release.set()
+    time.sleep(0.05)
+    assert discarded == ["slow"]
+
+
+def test_result_after_deadline_is_discarded(release):
+    breaker = CircuitBreaker("test")
+    discarded = []
+
+    def slow():
+        release.wait(5)
+        return "late"
+
+    start_request_deadline("20")
+    with pytest.raises(DeadlineExceeded):
+        call_upstream(breaker, slow, discard=discarded.append)
+    release.set()
+    time.sleep(0.05)
+    assert discarded == ["late"]
+
+
+def test_saturated_pool_rejects_without_tripping_breaker(monkeypatch, release):
+    monkeypatch.setattr(resilience, "_slots", threading.BoundedSemaphore(1))
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    start_request_deadline("20")
+
+    with pytest.raises(DeadlineExceeded):
+        call_upstream(breaker, release.wait, 5)
+    clear_request_deadline()
+
+    # The orphaned call still holds the only slot
+    other = CircuitBreaker("other", failure_threshold=1, reset_timeout=60)
+    with pytest.raises(PoolSaturated):
+        call_upstream(other, lambda: "ok")
+    assert not other.is_open
+
+    release.set()
+    time.sleep(0.05)
+    assert call_upstream(other, lambda: "ok") == "ok"
+
+
+def test_stream_failure_counts_against_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+
+    def body():
+        yield b"a"
+        raise ConnectionError("reset")
+
+    stream = guard_stream(breaker, body())
+    assert next(stream) == b"a"
+    with pytest.raises(ConnectionError):
+        next(stream)
+    assert breaker.is_open
+
+
+def test_stream_past_read_budget_is_cut_off():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    closed = []
+
+    def body():
+        try:
+            while True:
+                time.sleep(0.02)
+                yield b"a"
+        finally:
+            closed.append(True)
+
+    stream = guard_stream(breaker, body(), budget=0.05)
+    with pytest.raises(DeadlineExceeded):
+        for _ in stream:
+            pass
+    assert breaker.is_open
+    assert closed == [True]
+
+
+def test_slow_consumer_does_not_use_read_budget():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+
+    stream = guard_stream(breaker, iter([b"a", b"b", b"c"]), budget=0.05)
+    received = []
+    for chunk in stream:
+        received.append(chunk)
+        time.sleep(0.03)  # the client is slow to accept each chunk
+
+    assert received == [b"a", b"b", b"c"]
+    assert not breaker.is_open
+
+
+def test_stream_ignores_request_deadline():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    start_request_deadline("0")
+
+    assert list(guard_stream(breaker, iter([b"a", b"b"]))) == [b"a", b"b"]
+    assert not breaker.is_open
+
+
+def test_abandoned_stream_is_closed_without_failure():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    closed = []
+
+    def body():
+        try:
+            yield b"a"
+            yield b"b"
+        finally:
+            closed.append(True)
+
+    stream = guard_stream(breaker, body())
+    next(stream)
+    stream.close()
+    assert closed == [True]
+    assert not breaker.is_open
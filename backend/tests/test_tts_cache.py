@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from app import _prune_tts_cache, _tee_to_file
+
+
+class Upstream:
+    """Iterator over *chunks* that records being closed, optionally failing
+    after *fail_after* chunks."""
+
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = list(chunks)
+        self.fail_after = fail_after
+        self.sent = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.sent == self.fail_after:
+            raise ConnectionError("reset")
+        if self.sent == len(self.chunks):
+            raise StopIteration
+        self.sent += 1
+        return self.chunks[self.sent - 1]
+
+    def close(self):
+        self.closed = True
+
+
+def _leftovers(directory):
+    return [name for name in os.listdir(directory) if name.endswith(".part")]
+
+
+def test_complete_stream_is_renamed_into_place(tmp_path):
+    path = tmp_path / "clip.mp3"
+    upstream = Upstream([b"ab", b"cd"])
+
+    assert list(_tee_to_file(upstream, str(path))) == [b"ab", b"cd"]
+    assert path.read_bytes() == b"abcd"
+    assert _leftovers(tmp_path) == []
+    assert upstream.closed
+
+
+def test_failed_stream_leaves_nothing(tmp_path):
+    path = tmp_path / "clip.mp3"
+    upstream = Upstream([b"ab", b"cd"], fail_after=1)
+
+    with pytest.raises(ConnectionError):
+        list(_tee_to_file(upstream, str(path)))
+    assert not path.exists()
+    assert _leftovers(tmp_path) == []
+    assert upstream.closed
+
+
+def test_abandoned_stream_leaves_nothing_and_closes_upstream(tmp_path):
+    path = tmp_path / "clip.mp3"
+    upstream = Upstream([b"ab", b"cd"])
+
+    stream = _tee_to_file(upstream, str(path))
+    assert next(stream) == b"ab"
+    stream.close()
+
+    assert not path.exists()
+    assert _leftovers(tmp_path) == []
+    assert upstream.closed
+
+
+def _cached(directory, name, size, mtime):
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_prune_evicts_least_recently_used(tmp_path):
+    oldest = _cached(tmp_path, "henry-a.mp3", 100, 1_000)
+    middle = _cached(tmp_path, "henry-b.mp3", 100, 2_000)
+    newest = _cached(tmp_path, "henry-c.mp3", 100, 3_000)
+    partial = _cached(tmp_path, "henry-d.mp3.1234.part", 100, 0)
+
+    _prune_tts_cache(str(tmp_path), 200)
+
+    assert not oldest.exists()
+    assert middle.exists() and newest.exists()
+    # In-flight downloads are not the cache's to evict
+    assert partial.exists()
+
+
+def test_prune_keeps_cache_under_limit(tmp_path):
+    files = [_cached(tmp_path, f"henry-{i}.mp3", 100, 1_000 + i) for i in range(3)]
+
+    _prune_tts_cache(str(tmp_path), 300)
+
+    assert all(f.exists() for f in files)
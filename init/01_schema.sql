@@ -52,4 +52,24 @@ INSERT INTO classes (name) VALUES
   ('eecs388'),
   ('eecs484'),
   ('phil183')
-ON CONFLICT (name) DO NOTHING;
\ No newline at end of file
+ON CONFLICT (name) DO NOTHING;
+-- Lecture catalog (course -> recording), loaded from frontend/src/lectures.json
+-- by `python -m app.lectures`.  IF NOT EXISTS so re-applying this file on
+-- startup also migrates existing databases.
+CREATE TABLE IF NOT EXISTS lectures (
+  recording_id  TEXT PRIMARY KEY,
+  class_id      BIGINT NOT NULL REFERENCES classes(class_id) ON DELETE CASCADE,
+  lecture_date  DATE NOT NULL
+);
+
+-- One recording per class and date, so joining hits to lectures on
+-- (class_id, lecture_date) yields at most one row per hit
+DROP INDEX IF EXISTS idx_lectures_class_date;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_lectures_class_date
+ON lectures(class_id, lecture_date);
+
+-- Recording the agent cited (not a FK: the agent can cite unknown ids)
+ALTER TABLE recording_hits ADD COLUMN IF NOT EXISTS recording_id TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_recording_hits_recording
+ON recording_hits(recording_id, rec_time);